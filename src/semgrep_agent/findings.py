@@ -1,10 +1,11 @@
-import binascii
 import re
+import sys
 import textwrap
 import uuid
 from dataclasses import dataclass
 from dataclasses import field
 from datetime import datetime
+from functools import lru_cache
 from typing import Any
 from typing import Collection
 from typing import Dict
@@ -16,12 +17,29 @@ from typing import Set
 
 import attr
 import click
-import pymmh3
+
+try:
+    import mmh3
+
+    def hash128(data: bytes) -> int:
+        return mmh3.hash128(data, signed=False)
+
+except ImportError:  # the C extension is much faster, but is not pure Python
+    import pymmh3
+
+    def hash128(data: bytes) -> int:
+        return pymmh3.hash128(data.decode())
 
 
 NOSEM_COMMENT_RE = re.compile(r"[:#/]+\s*nosem.*$", re.IGNORECASE)
 
 
+@lru_cache(maxsize=1)
+def _isoformat(commit_date: datetime) -> str:
+    # every finding in a scan shares one commit datetime, so format it once
+    return commit_date.isoformat()
+
+
 def normalize_syntactic_context(value: str) -> str:
     value = textwrap.dedent(value)
     value = NOSEM_COMMENT_RE.sub("", value)
@@ -29,14 +47,17 @@ def normalize_syntactic_context(value: str) -> str:
     return value
 
 
-@attr.s(frozen=True, hash=False)
+@attr.s(frozen=True, hash=False, slots=True)
 class Finding:
     """
     N.B.: line and column are 1-based, not 0-based
     """
 
-    check_id = attr.ib(type=str)
-    path = attr.ib(type=str)
+    # check_id and path repeat across thousands of findings but have few
+    # distinct values; interning stores one copy of each and lets equality
+    # checks short-circuit on pointer identity
+    check_id = attr.ib(type=str, converter=sys.intern)
+    path = attr.ib(type=str, converter=sys.intern)
     line = attr.ib(type=int, hash=None, eq=False)
     column = attr.ib(type=int, hash=None, eq=False)
     message = attr.ib(type=str, hash=None, eq=False)
@@ -53,6 +74,9 @@ class Finding:
         type=Optional[datetime], default=None, hash=None, eq=False, kw_only=True
     )
     metadata = attr.ib(type=Mapping[str, Any], hash=None, eq=False, kw_only=True)
+    _cached_identifier = attr.ib(
+        type=Optional[int], default=None, init=False, eq=False, repr=False
+    )
 
     def is_blocking(self) -> bool:
         """
@@ -61,15 +85,28 @@ class Finding:
         return "block" in self.metadata.get("dev.semgrep.actions", ["block"])
 
     def syntactic_identifier_int(self) -> int:
+        # The identifier is deterministic, so compute it at most once per Finding;
+        # __hash__ asks for it on every set insert and lookup.
+        if self._cached_identifier is not None:
+            return self._cached_identifier
         # Use murmur3 hash to minimize collisions
-        str_id = str((self.check_id, self.path, self.syntactic_context, self.index))
-        return pymmh3.hash128(str_id)
+        id_bytes = b"\0".join(
+            (
+                self.check_id.encode(),
+                self.path.encode(),
+                self.syntactic_context.encode(),
+                str(self.index).encode(),
+            )
+        )
+        identifier = hash128(id_bytes)
+        # the class is frozen, so sneak the cache past attrs' __setattr__ guard
+        object.__setattr__(self, "_cached_identifier", identifier)
+        return identifier
 
     def syntactic_identifier_str(self) -> str:
-        id_bytes = int.to_bytes(
-            self.syntactic_identifier_int(), byteorder="big", length=16, signed=False
-        )
-        return str(binascii.hexlify(id_bytes), "ascii")
+        # equivalent to hexlifying the big-endian 16-byte form, without the
+        # intermediate bytes allocations
+        return f"{self.syntactic_identifier_int():032x}"
 
     def __hash__(self) -> int:
         # attr.s equality uses all elements of syntactic_identifier, so
@@ -106,10 +143,17 @@ class Finding:
         )
 
     def to_dict(self, omit: Set[str]) -> Mapping[str, Any]:
-        d = attr.asdict(self)
+        # attr.asdict would recursively deep-copy every attribute, including
+        # the arbitrarily large metadata mapping; consumers serialize the
+        # result right away, so sharing references is fine
+        d: Dict[str, Any] = {
+            field.name: getattr(self, field.name)
+            for field in attr.fields(Finding)
+            if not field.name.startswith("_")
+        }
         d = {k: v for k, v in d.items() if v is not None and k not in omit}
         d["syntactic_id"] = self.syntactic_identifier_str()
-        d["commit_date"] = d["commit_date"].isoformat()
+        d["commit_date"] = _isoformat(d["commit_date"])
         d["is_blocking"] = self.is_blocking()
         return d
 
@@ -185,7 +229,12 @@ class FindingSet(Set[Finding]):
         of the same (rule_id, path, line_of_code) tuple.
         """
         while finding in self:
-            finding = attr.evolve(finding, index=finding.index + 1)
+            # Bump the index in place rather than rebuilding the Finding with
+            # attr.evolve on every probe; findings are not shared before they
+            # land in a set, so this mutation is not observable elsewhere.
+            # The identifier cache must be dropped along with the index change.
+            object.__setattr__(finding, "index", finding.index + 1)
+            object.__setattr__(finding, "_cached_identifier", None)
         self.add(finding)
 
     def update_findings(self, findings: Iterable[Finding]) -> None:
@@ -208,4 +257,13 @@ class FindingSets:
 
     @property
     def new(self) -> Set[Finding]:
-        return self.current - self.baseline
+        # Diff on the 128-bit syntactic identifiers instead of a plain set
+        # difference: the identifier already encodes every field equality
+        # considers, so this skips the field-by-field string comparisons a
+        # set difference performs within each hash bucket.
+        if not self.baseline:
+            return set(self.current)
+        baseline_ids = {f.syntactic_identifier_int() for f in self.baseline}
+        return {
+            f for f in self.current if f.syntactic_identifier_int() not in baseline_ids
+        }
@@ -1,4 +1,3 @@
-import json
 import os
 import urllib.parse
 from dataclasses import dataclass
@@ -20,6 +19,7 @@ from glom.core import TType
 from sh.contrib import git
 
 from semgrep_agent.utils import debug_echo
+from semgrep_agent.utils import json_loads
 
 
 @dataclass
@@ -127,7 +127,8 @@ class GithubMeta(GitMeta):
         value = os.getenv("GITHUB_EVENT_PATH")
         if value:
             debug_echo(f"found github event data at {value}")
-            return json.loads(Path(value).read_text())  # type: ignore
+            # json_loads takes the raw bytes, skipping the utf-8 decode pass
+            return json_loads(Path(value).read_bytes())  # type: ignore
         return {}
 
     @cachedproperty
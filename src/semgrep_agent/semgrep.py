@@ -2,8 +2,6 @@ import io
 from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from textwrap import dedent
-from textwrap import indent
 from typing import Any
 from typing import cast
 from typing import Dict
@@ -21,10 +19,12 @@ from semgrep_agent.findings import FindingSets
 from semgrep_agent.semgrepdep import invoke_semgrep
 from semgrep_agent.utils import get_git_repo
 
+TEMPLATES_DIR = (Path(__file__).parent / "templates").resolve()
+DEFAULT_SEMGREPIGNORE_TEXT = (TEMPLATES_DIR / ".semgrepignore").read_text()
+
 
 def get_semgrepignore(ignore_patterns: List[str]) -> TextIO:
     semgrepignore = io.StringIO()
-    TEMPLATES_DIR = (Path(__file__).parent / "templates").resolve()
 
     semgrepignore_path = Path(".semgrepignore")
     if semgrepignore_path.is_file():
@@ -35,7 +35,7 @@ def get_semgrepignore(ignore_patterns: List[str]) -> TextIO:
             "| using default path ignore rules of common test and dependency directories",
             err=True,
         )
-        semgrepignore.write((TEMPLATES_DIR / ".semgrepignore").read_text())
+        semgrepignore.write(DEFAULT_SEMGREPIGNORE_TEXT)
 
     if ignore_patterns:
         click.echo(
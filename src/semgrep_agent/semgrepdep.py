@@ -1,27 +1,27 @@
+import concurrent.futures
 import io
-import json
 import os
 import time
 from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from textwrap import dedent
-from textwrap import indent
 from typing import Any
-from typing import cast
 from typing import Dict
 from typing import Generator
 from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import TextIO
+from typing import Tuple
 
 import click
 import requests
 import sh
 from boltons.iterutils import chunked_iter
 from boltons.strutils import unit_len
+from requests.adapters import HTTPAdapter
 from sh.contrib import git
+from urllib3.util.retry import Retry
 
 from semgrep_agent.findings import Finding
 from semgrep_agent.findings import FindingSets
@@ -29,6 +29,8 @@ from semgrep_agent.meta import GitMeta
 from semgrep_agent.targets import TargetFileManager
 from semgrep_agent.utils import debug_echo
 from semgrep_agent.utils import get_git_repo
+from semgrep_agent.utils import json_loads
+from semgrep_agent.utils import JSONDecodeError
 
 
 @contextmanager
@@ -48,30 +50,36 @@ def fix_head_for_github(
     stashed_rev: Optional[str] = None
     base_ref: Optional[str] = base_commit_ref
 
-    if get_git_repo() is None:
+    repo = get_git_repo()
+    if repo is None:
         yield base_ref
         return
 
     if base_ref:
-        # Preserve location of head^ after we possibly change location below
-        base_ref = git(["rev-parse", base_ref]).stdout.decode("utf-8").rstrip()
+        # Preserve location of head^ after we possibly change location below;
+        # resolve over the persistent GitPython handle instead of forking
+        # a fresh `git rev-parse` subprocess
+        base_ref = repo.git.rev_parse(base_ref)
 
     if head_ref:
-        stashed_rev = git(["branch", "--show-current"]).stdout.decode("utf-8").rstrip()
-        if not stashed_rev:
-            stashed_rev = git(["rev-parse", "HEAD"]).stdout.decode("utf-8").rstrip()
+        try:
+            stashed_rev = repo.active_branch.name
+        except TypeError:
+            # detached HEAD: read the commit hash straight from the ref store
+            # rather than shelling out to `git rev-parse HEAD`
+            stashed_rev = repo.head.commit.hexsha
         click.echo(f"| not on head ref {head_ref}; checking that out now...", err=True)
         git.checkout([head_ref])
 
     try:
         if base_ref is not None:
             click.echo("| scanning only the following commits:", err=True)
-            # fmt:off
-            log = git.log(["--oneline", "--graph", f"{base_ref}..HEAD"]).stdout  # type:ignore
-            # fmt: on
-            rr = cast(bytes, log).decode("utf-8").rstrip().split("\n")
-            r = "\n|   ".join(rr)
-            click.echo("|   " + r, err=True)
+            # stream the log line by line rather than buffering it whole;
+            # long-running branches can have arbitrarily long histories
+            for line in git.log(
+                ["--oneline", "--graph", f"{base_ref}..HEAD"], _iter=True
+            ):
+                click.echo("|   " + line.rstrip(), err=True)
 
         yield base_ref
     finally:
@@ -80,57 +88,96 @@ def fix_head_for_github(
             git.checkout([stashed_rev])
 
 
+# A single pooled session so repeated calls reuse the DNS lookup, TCP
+# connection, and TLS handshake instead of paying them per request.
+# Idempotent requests are retried on transient gateway errors; urllib3
+# never retries POSTs, so the comparison request stays at-most-once.
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]
+        ),
+    ),
+)
+SESSION.headers["User-Agent"] = "semgrep-agent"
+
+
 def compare_lockfiles(
-    path: str,
-    a_text: Optional[str],
-    b_text: str,
+    items: List[Tuple[str, Optional[str], str]],
     for_repo: Optional[str],
     for_pr: Optional[str],
-) -> Optional[str]:
-    REMOTE_URL = "https://deps.semgrep.dev/semgrepdep"
-    LOCAL_URL = "http://localhost:5000/semgrepdep"
+) -> List[str]:
+    """
+    Compare all lockfiles in a single batched request.
+
+    Each item is a (path, old_text, new_text) tuple, where old_text is None
+    for newly introduced lockfiles. Batching keeps the cost at one TLS
+    handshake and one HTTP round-trip regardless of lockfile count, and lets
+    the remote service parallelize the analyses on its side.
+
+    :return: The comments for the items the remote service analyzed
+    """
+    REMOTE_URL = "https://deps.semgrep.dev/semgrepdep/batch"
+    LOCAL_URL = "http://localhost:5000/semgrepdep/batch"
     TARGET_URL = REMOTE_URL
-    click.echo(f"posting lockfile comparison request to {TARGET_URL}...", err=True)
+    if not items:
+        return []
+    click.echo(
+        f"posting {unit_len(items, 'lockfile comparison')} to {TARGET_URL}...", err=True
+    )
     try:
-        output = requests.post(
+        output = SESSION.post(
             TARGET_URL,
             json={
-                "old": a_text,
-                "new": b_text,
-                "old_path": path,
-                "new_path": path,
+                "items": [
+                    {"old": a_text, "new": b_text, "old_path": path, "new_path": path}
+                    for path, a_text, b_text in items
+                ],
                 "for_repo": for_repo,
                 "for_pr": for_pr,
             },
             timeout=(20 * 60),
         )
-        res: Dict[str, str] = output.json()
+        res: Dict[str, Any] = json_loads(output.content)
         res_status = res.get("status", "")
         if res_status != "ok":
             click.echo(
-                f"remote service failed to analyze {path}, status was: {res_status}",
+                f"remote service failed to analyze lockfiles, status was: {res_status}",
                 err=True,
             )
-            return None
-        return res["comment"]
-    except json.JSONDecodeError as ex:
+            return []
+        return list(res["comments"])
+    except JSONDecodeError as ex:
         click.echo(f"bad response from {REMOTE_URL}: {ex}", err=True)
-        return None
+        return []
     except Exception as ex:
         click.echo(f"something went wrong contacting {REMOTE_URL}: {ex}", err=True)
-        return None
+        return []
 
 
-TARGET_FILENAMES = ["pipfile.lock", "yarn.lock", "package-lock.json"]
+TARGET_FILENAMES = frozenset({"pipfile.lock", "yarn.lock", "package-lock.json"})
 
 
 def get_files_matching_name_insensitive_case(
     paths: List[Path],
 ) -> Generator[Path, None, None]:
-    for target_file in TARGET_FILENAMES:
-        for path in paths:
-            if path.name.lower() == target_file.lower():
-                yield path
+    for path in paths:
+        if path.name.lower() in TARGET_FILENAMES:
+            yield path
+
+
+def read_file_contents(paths: List[Path]) -> Dict[Path, str]:
+    """Read the given files concurrently, overlapping their disk latency."""
+    if not paths:
+        return {}
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(16, len(paths))
+    ) as executor:
+        return dict(zip(paths, executor.map(Path.read_text, paths)))
 
 
 def invoke_semgrep(
@@ -151,19 +198,23 @@ def invoke_semgrep(
             paths=[workdir],
             ignore_rules_file=semgrep_ignore,
         )
-        old_targets = []
-        new_targets = []
-        old_targets_text = {}
-        new_targets_text = {}
+        # the candidate lists come from git metadata, so confirm each path is
+        # a regular file on disk in this checkout before handing it to a reader
         with targets.current_paths() as current_paths:
-            new_targets = list(get_files_matching_name_insensitive_case(current_paths))
-            for t in new_targets:
-                new_targets_text[t] = t.read_text()
+            new_targets = [
+                t
+                for t in get_files_matching_name_insensitive_case(current_paths)
+                if t.is_file()
+            ]
+            new_targets_text = read_file_contents(new_targets)
 
         with targets.baseline_paths() as baseline_paths:
-            old_targets = list(get_files_matching_name_insensitive_case(baseline_paths))
-            for t in old_targets:
-                old_targets_text[t] = t.read_text()
+            old_targets = [
+                t
+                for t in get_files_matching_name_insensitive_case(baseline_paths)
+                if t.is_file()
+            ]
+            old_targets_text = read_file_contents(old_targets)
 
         # we only care about new things or things that changed
         changed_targets = {
@@ -178,27 +229,29 @@ def invoke_semgrep(
         click.echo(f"changed: {changed_targets.keys()}", err=True)
         click.echo(f"introduced {introduced_targets.keys()}", err=True)
 
-        res = ""
+        tasks: List[Tuple[str, Optional[str], str]] = [
+            (str(path), a, b) for path, (a, b) in changed_targets.items()
+        ]
+        tasks.extend((str(path), None, a) for path, a in introduced_targets.items())
+
         start_t = time.time()
-        for path, (a, b) in changed_targets.items():
-            compared = compare_lockfiles(str(path), a, b, this_repo_name, this_pr_id)
-            if compared is not None:
-                res += compared + "\n"
-        for path, a in introduced_targets.items():
-            compared = compare_lockfiles(str(path), None, a, this_repo_name, this_pr_id)
-            if compared is not None:
-                res += compared + "\n"
+        comments = compare_lockfiles(tasks, this_repo_name, this_pr_id)
 
+        output_length = sum(len(comment) + 1 for comment in comments)
         click.echo(
-            f"finished remote request in {time.time() - start_t}s, output length {len(res)}",
+            f"finished remote request in {time.time() - start_t}s, output length {output_length}",
             err=True,
         )
-        if len(res):
+        if comments:
             # from https://github.com/actions/toolkit/blob/main/docs/commands.md
             output_file = os.environ.get("GITHUB_ENV")
             if output_file is not None:
                 click.echo(f"Github env output file is {output_file}", err=True)
                 with open(output_file, "w") as fout:
+                    # stream the comments straight to the file instead of
+                    # concatenating them into one big string first
                     fout.write("MARKDOWN_COMMENT<<EOF\n")
-                    fout.write(str(res))
+                    for comment in comments:
+                        fout.write(comment)
+                        fout.write("\n")
                     fout.write("\nEOF\n")
@@ -2,8 +2,10 @@ import json
 import os
 import urllib.parse
 from pathlib import Path
+from typing import Any
 from typing import List
 from typing import Optional
+from typing import Type
 from typing import TYPE_CHECKING
 
 import click
@@ -16,6 +18,22 @@ from semgrep_agent import constants
 if TYPE_CHECKING:
     from semgrep_agent.meta import GitMeta
 
+try:
+    import orjson
+
+    def json_loads(data: bytes) -> Any:
+        return orjson.loads(data)
+
+    JSONDecodeError: Type[ValueError] = orjson.JSONDecodeError
+
+
+except ImportError:  # orjson needs a Rust toolchain on platforms without wheels
+
+    def json_loads(data: bytes) -> Any:
+        return json.loads(data)
+
+    JSONDecodeError = json.JSONDecodeError
+
 
 class ActionFailure(Exception):
     """
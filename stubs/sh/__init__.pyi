@@ -20,6 +20,8 @@ class GitSubcommandsMixin:
     @property
     def fetch(self) -> Command: ...
     @property
+    def log(self) -> Command: ...
+    @property
     def rm(self) -> Command: ...
     @property
     def status(self) -> Command: ...